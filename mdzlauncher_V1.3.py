@@ -1,5 +1,8 @@
 import sys
+import atexit
 import os
+import re
+import copy
 import zipfile
 import tempfile
 import subprocess
@@ -8,10 +11,22 @@ import uuid
 import json
 import logging
 import time
+import threading
+import warnings
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from PyQt5 import QtWidgets, QtGui, QtCore
-from win10toast import ToastNotifier
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+
+# 优先使用 orjson 读写配置，未安装时回退到标准库 json
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = lambda o: orjson.dumps(o, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    _loads = json.loads
+    _dumps = lambda o: json.dumps(o, indent=4, ensure_ascii=False).encode('utf-8')
 
 # 获取当前应用程序所在目录（绝对路径）
 app_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
@@ -31,24 +46,59 @@ logging.basicConfig(filename=LOG_FILE,
                     level=logging.ERROR,
                     format='%(asctime)s:%(levelname)s:%(message)s')
 
+# 配置缓存：以文件的 st_mtime_ns 为键，文件未变化时不再重复读取和解析
+_config_cache = {"mtime": -1, "data": None, "serialized": None}
+
+def _config_mtime():
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
 def load_config():
     config = default_config.copy()
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                user_config = json.load(f)
-                config.update(user_config)
-        except Exception as e:
-            logging.error(f"加载配置失败: {e}")
+    mtime = _config_mtime()
+    if mtime is None:
+        return config
+    if mtime == _config_cache["mtime"]:
+        config.update(copy.deepcopy(_config_cache["data"]))
+        return config
+    try:
+        with open(CONFIG_FILE, 'rb') as f:
+            user_config = _loads(f.read())
+            config.update(user_config)
+        _config_cache.update(mtime=mtime, data=copy.deepcopy(user_config),
+                             serialized=json.dumps(user_config, sort_keys=True))
+    except Exception as e:
+        logging.error(f"加载配置失败: {e}")
     return config
 
 def save_config(config):
+    serialized = json.dumps(config, sort_keys=True)
+    # 内容与磁盘上的配置一致时跳过写入
+    if serialized == _config_cache["serialized"] and _config_mtime() == _config_cache["mtime"]:
+        return
+    tmp = None
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
+        # 先写入同目录下的临时文件，再用 os.replace 原子替换，避免写到一半时配置损坏
+        fd, tmp = tempfile.mkstemp(dir=app_dir, prefix='.mdz_cfg_', suffix='.tmp')
+        try:
+            os.write(fd, _dumps(config))
+        finally:
+            os.close(fd)
+        os.replace(tmp, CONFIG_FILE)
+        tmp = None
+        _config_cache.update(mtime=_config_mtime(), data=copy.deepcopy(config),
+                             serialized=serialized)
     except Exception as e:
         logging.error(f"保存配置失败: {e}")
+        if tmp:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
 
+@lru_cache(maxsize=32)
 def resolve_path(path):
     # 将配置中的相对路径转换为绝对路径，如果已是绝对路径则直接返回
     if not os.path.isabs(path):
@@ -61,26 +111,180 @@ def resolve_path(path):
             return path
     return path
 
-class DocumentSaveHandler(FileSystemEventHandler):
+def iter_tree(root):
+    """
+    使用 os.scandir 遍历目录树，依次产出 (路径, 归档名, 是否目录)。
+    """
+    stack = [(root, "")]
+    while stack:
+        dir_path, prefix = stack.pop()
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                arcname = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    yield entry.path, arcname + "/", True
+                    stack.append((entry.path, arcname + "/"))
+                else:
+                    yield entry.path, arcname, False
+
+# 文本类文件使用 deflate 压缩；图片等资源大多已是压缩格式，直接存储即可
+DEFLATE_EXTENSIONS = {'.md', '.txt', '.json', '.svg', '.html', '.css'}
+
+def compress_type_for(arcname):
+    if os.path.splitext(arcname)[1].lower() in DEFLATE_EXTENSIONS:
+        return zipfile.ZIP_DEFLATED
+    return zipfile.ZIP_STORED
+
+def deflate_file(path, arcname, level=9):
+    """
+    在工作线程中压缩单个文件（zlib 压缩时会释放 GIL），非文本文件仅计算 crc32 原样存储。
+    返回 (归档名, crc32, 压缩数据, 原始大小, stat结果, 压缩方式)。
+    原始大小按实际读取的字节数计算，打包期间文件被改写时条目头也与数据一致。
+    """
+    st = os.stat(path)
+    compress_type = compress_type_for(arcname)
+    compressor = None
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc = 0
+    size = 0
+    chunks = []
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            chunks.append(compressor.compress(block) if compressor else block)
+    if compressor:
+        chunks.append(compressor.flush())
+    return arcname, crc, b"".join(chunks), size, st, compress_type
+
+def write_zip_entry(zf, arcname, crc, data, size, st, compress_type=zipfile.ZIP_DEFLATED):
+    """
+    将已压缩好的数据直接写入 ZipFile（跳过 zipfile 自身的压缩流程）。
+    """
+    # ZIP 只能记录 1980~2107 年的时间，超出范围时取边界值（与 strict_timestamps=False 一致）
+    date_time = time.localtime(st.st_mtime)[:6]
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        date_time = (2107, 12, 31, 23, 59, 59)
+    zinfo = zipfile.ZipInfo(arcname, date_time)
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    if arcname.endswith("/"):
+        zinfo.external_attr |= 0x10  # MS-DOS 目录标志
+    zinfo.compress_type = compress_type
+    zinfo.file_size = size
+    zinfo.compress_size = len(data)
+    zinfo.CRC = crc
+    zinfo.header_offset = zf.fp.tell()
+    zf.fp.write(zinfo.FileHeader())
+    zf.fp.write(data)
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[arcname] = zinfo
+    zf.start_dir = zf.fp.tell()
+
+def build_zip(src_dir, dst_path, level=9):
+    """
+    将 src_dir 下的所有内容打包为 dst_path（ZIP 格式），各文件在线程池中并行压缩。
+    同时在压缩中的文件数限制为线程数的两倍，避免所有压缩结果同时驻留内存。
+    """
+    dirs = []
+    files = []
+    for path, arcname, is_dir in iter_tree(src_dir):
+        if is_dir:
+            dirs.append((arcname, os.stat(path)))
+        else:
+            files.append((path, arcname))
+
+    workers = min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool, zipfile.ZipFile(dst_path, 'w') as zf:
+        for arcname, st in dirs:
+            write_zip_entry(zf, arcname, 0, b"", 0, st, zipfile.ZIP_STORED)
+        pending = deque()
+        for path, arcname in files:
+            pending.append(pool.submit(deflate_file, path, arcname, level))
+            if len(pending) >= workers * 2:
+                write_zip_entry(zf, *pending.popleft().result())
+        while pending:
+            write_zip_entry(zf, *pending.popleft().result())
+
+def tree_signature(root):
+    """
+    返回 {归档名: (st_size, st_mtime_ns)}，用于判断自上次打包后哪些文件发生了变化。
+    """
+    signature = {}
+    for path, arcname, is_dir in iter_tree(root):
+        if not is_dir:
+            st = os.stat(path)
+            signature[arcname] = (st.st_size, st.st_mtime_ns)
+    return signature
+
+def append_to_zip(zip_path, src_dir, arcnames, level=9):
+    """
+    以追加模式把指定文件写入已有的 ZIP。同名条目会重复出现，解压时以最后一个为准。
+    追加在副本上进行，完成后再原子替换原文件，避免中途损坏。
+    """
+    temp_path = zip_path + ".temp"
+    shutil.copyfile(zip_path, temp_path)
+    try:
+        with warnings.catch_warnings():
+            # zipfile 对重复文件名会给出 UserWarning，这里是有意为之
+            warnings.simplefilter("ignore", UserWarning)
+            with zipfile.ZipFile(temp_path, 'a', zipfile.ZIP_DEFLATED, compresslevel=level,
+                                 strict_timestamps=False) as zf:
+                for arcname in arcnames:
+                    zf.write(os.path.join(src_dir, *arcname.split("/")), arcname,
+                             compress_type=compress_type_for(arcname))
+        os.replace(temp_path, zip_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def remove_tree(root):
     """
-    文件保存事件处理器，每当document.md被修改时触发打包。
+    基于 os.scandir 删除整个目录树，忽略删除失败的条目。
+    DirEntry 自带类型信息，省去 shutil.rmtree 对每个条目额外的 stat/lstat 调用。
     """
-    def __init__(self, launcher):
+    try:
+        with os.scandir(root) as it:
+            entries = list(it)
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                remove_tree(entry.path)
+            else:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+    try:
+        os.rmdir(root)
+    except OSError:
+        pass
+
+class _RmtreeRunnable(QtCore.QRunnable):
+    """
+    在 QThreadPool 中后台删除临时目录，避免阻塞GUI线程。
+    """
+    def __init__(self, path, done=None):
         super().__init__()
-        self.launcher = launcher
-        self.last_modified = 0
-        self.debounce_time = 1.0  # 防抖时间1秒
+        self.path = path
+        # 可选的 threading.Event，删除结束后置位
+        self.done = done
 
-    def on_modified(self, event):
-        if event.is_directory:
-            return
-        if os.path.basename(event.src_path) == "document.md":
-            now = time.time()
-            # 防抖处理，如果在1秒内多次修改，仅最后一次触发
-            if now - self.last_modified > self.debounce_time:
-                # 延迟执行打包
-                QtCore.QTimer.singleShot(int(self.debounce_time*1000), self.launcher.pack_on_save)
-            self.last_modified = now
+    def run(self):
+        try:
+            remove_tree(self.path)
+        finally:
+            if self.done is not None:
+                self.done.set()
 
 class MDZLauncher(QtWidgets.QMainWindow):
     def __init__(self):
@@ -88,28 +292,50 @@ class MDZLauncher(QtWidgets.QMainWindow):
         self.setWindowTitle("MDZ Launcher")
         self.setGeometry(100, 100, 800, 600)  # 增大窗口尺寸以适应日志显示
         self.temp_dir = None
+        # 整个会话共用一个临时根目录，每次新建/打开时复用其中的 work 目录
+        self._session_temp_root = os.path.join(tempfile.gettempdir(), f"mdz_session_{os.getpid()}")
+        os.makedirs(self._session_temp_root, exist_ok=True)
+        atexit.register(remove_tree, self._session_temp_root)
         self.mdz_path = None
         self.typora_process = None
+        self.unpack_proc = None
+        self._unpack_progress = -1
+        # work 目录未能改名移开、直接在后台删除时置为 threading.Event，删除完成前不能复用 work
+        self._work_discard = None
+        # 上次打包时各文件的大小和修改时间，用于增量打包及跳过无变化的打包
+        self._last_packed_sig = {}
+        # .mdz 是否由保存时的快速打包生成（含增量追加的重复条目或低压缩级别），最终关闭时需要完整重打包
+        self._mdz_needs_repack = False
         self.config = load_config()
-        self.toaster = ToastNotifier()
         self.initUI()
 
-        # 监视器和事件处理器
-        self.observer = None
-        self.event_handler = None
+        # 通过系统托盘显示通知，无需为每条通知创建额外的线程和窗口
+        icon = self.windowIcon()
+        if icon.isNull():
+            icon = self.style().standardIcon(QtWidgets.QStyle.SP_ComputerIcon)
+        self.tray = QtWidgets.QSystemTrayIcon(icon, self)
+        self.tray.show()
+
+        # 文件监控（在GUI线程中运行，无需额外线程）
+        self.fs_watcher = None
+        # 防抖定时器：每次修改都会重新计时，停止修改1秒后才触发打包
+        self._debounce_timer = QtCore.QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(1000)
+        self._debounce_timer.timeout.connect(self.pack_on_save)
 
     def initUI(self):
         menubar = self.menuBar()
         fileMenu = menubar.addMenu('文件')
 
-        newAction = QtWidgets.QAction('新建 .mdz 文件', self)
-        newAction.triggered.connect(self.new_mdz)
-        fileMenu.addAction(newAction)
+        self.newAction = QtWidgets.QAction('新建 .mdz 文件', self)
+        self.newAction.triggered.connect(self.new_mdz)
+        fileMenu.addAction(self.newAction)
 
-        openAction = QtWidgets.QAction('打开 .mdz 文件', self)
-        openAction.setShortcut('Ctrl+O')
-        openAction.triggered.connect(self.open_mdz)
-        fileMenu.addAction(openAction)
+        self.openAction = QtWidgets.QAction('打开 .mdz 文件', self)
+        self.openAction.setShortcut('Ctrl+O')
+        self.openAction.triggered.connect(self.open_mdz)
+        fileMenu.addAction(self.openAction)
 
         settingsMenu = menubar.addMenu('设置')
         configAction = QtWidgets.QAction('配置路径', self)
@@ -124,8 +350,17 @@ class MDZLauncher(QtWidgets.QMainWindow):
         self.log_view = QtWidgets.QTextEdit()
         self.log_view.setReadOnly(True)
         self.log_view.setPlaceholderText("日志信息将在此显示...")
+        # 最多保留2000条日志，超出后自动丢弃最早的记录
+        self.log_view.document().setMaximumBlockCount(2000)
         layout.addWidget(self.log_view)
 
+        # 日志先缓存，每50ms合并写入一次，避免每条日志都触发一次排版
+        self._log_buffer = []
+        self._log_flush_timer = QtCore.QTimer(self)
+        self._log_flush_timer.setSingleShot(True)
+        self._log_flush_timer.setInterval(50)
+        self._log_flush_timer.timeout.connect(self._flush_log)
+
         # 添加清除日志和查看日志文件按钮
         button_layout = QtWidgets.QHBoxLayout()
         self.clear_log_button = QtWidgets.QPushButton("清除日志")
@@ -153,7 +388,26 @@ class MDZLauncher(QtWidgets.QMainWindow):
             color = "red"
         else:
             color = "black"
-        self.log_view.append(f'<span style="color:{color};">[{timestamp}] {message}</span>')
+        self._log_buffer.append(f'<span style="color:{color};">[{timestamp}] {message}</span>')
+        if not self._log_flush_timer.isActive():
+            self._log_flush_timer.start()
+
+    def _flush_log(self):
+        """
+        将缓存的日志一次性写入日志视图。
+        """
+        if not self._log_buffer:
+            return
+        lines, self._log_buffer = self._log_buffer, []
+        cursor = self.log_view.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.beginEditBlock()
+        for line in lines:
+            # 每条日志单独成段，与 QTextEdit.append 的效果一致
+            if not self.log_view.document().isEmpty():
+                cursor.insertBlock()
+            cursor.insertHtml(line)
+        cursor.endEditBlock()
         # 自动滚动到文档末尾
         self.log_view.moveCursor(QtGui.QTextCursor.End)
 
@@ -164,8 +418,48 @@ class MDZLauncher(QtWidgets.QMainWindow):
             # 更新配置并保存
             self.config.update(new_config)
             save_config(self.config)
+            # 路径配置可能已变化，清除已缓存的解析结果
+            resolve_path.cache_clear()
             self.append_log("配置已更新", level="INFO")
 
+    def _update_actions(self):
+        """
+        解压或 Typora 编辑进行中时禁用新建/打开，避免第二次操作清空仍在使用的 work 目录。
+        """
+        busy = self._session_busy()
+        self.newAction.setEnabled(not busy)
+        self.openAction.setEnabled(not busy)
+
+    def _session_busy(self):
+        return self.unpack_proc is not None or self.typora_process is not None
+
+    def _prepare_temp_dir(self):
+        """
+        准备一个空的工作目录（会话内复用同一路径），成功返回 True。
+        work 目录仍在使用、正在后台删除或无法清空时返回 False。
+        """
+        work_dir = os.path.join(self._session_temp_root, "work")
+        if self._session_busy():
+            msg = "当前文档仍在编辑或解压中，请先关闭 Typora。"
+        elif self._work_discard is not None and not self._work_discard.is_set():
+            msg = "临时目录正在后台清理，请稍后再试。"
+        else:
+            msg = None
+            if os.path.exists(work_dir):
+                remove_tree(work_dir)
+                # remove_tree 会忽略删除失败的文件（如被杀毒软件或 Typora 占用），残留文件会被打包进下一个文档
+                if os.path.exists(work_dir):
+                    msg = f"无法清空临时目录（文件可能被占用）: {work_dir}"
+        if msg:
+            self.append_log(f"错误: {msg}", level="ERROR")
+            QtWidgets.QMessageBox.critical(self, "错误", msg)
+            return False
+        os.makedirs(work_dir, exist_ok=True)
+        self.temp_dir = work_dir
+        self._last_packed_sig = {}
+        self._mdz_needs_repack = False
+        return True
+
     def new_mdz(self):
         """
         实现新建 .mdz 文件功能：
@@ -179,48 +473,106 @@ class MDZLauncher(QtWidgets.QMainWindow):
         if file_path:
             if not file_path.lower().endswith('.mdz'):
                 file_path += '.mdz'
+            if not self._prepare_temp_dir():
+                return
             self.mdz_path = file_path
-            self.temp_dir = os.path.join(tempfile.gettempdir(), f"mdz_temp_{uuid.uuid4()}")
-            os.makedirs(self.temp_dir, exist_ok=True)
-            doc_path = os.path.join(self.temp_dir, "document.md")
-            with open(doc_path, 'w', encoding='utf-8') as f:
-                f.write("# 新文档\n\n这里是新建的 MDZ 文档，您可以开始编辑...")
             assets_dir = os.path.join(self.temp_dir, "document.assets")
             os.makedirs(assets_dir, exist_ok=True)
+            # 先写入临时文件再原子替换，document.md 一出现就是完整内容
+            doc_path = os.path.join(self.temp_dir, "document.md")
+            tmp_path = doc_path + ".tmp"
+            payload = "# 新文档\n\n这里是新建的 MDZ 文档，您可以开始编辑..."
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            try:
+                os.write(fd, payload.encode('utf-8'))
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, doc_path)
             self.append_log(f"新建 .mdz 文件: {self.mdz_path}", level="INFO")
             self.launch_typora()
 
     def open_mdz(self):
         options = QtWidgets.QFileDialog.Options()
         file_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "选择 .mdz 文件", "", "MDZ Files (*.mdz);;All Files (*)", options=options)
-        if file_path:
+        # 对话框打开期间会话状态可能已变化；正在编辑的文档不能被换掉 mdz_path
+        if file_path and not self._session_busy():
             self.mdz_path = file_path
             self.append_log(f"打开 .mdz 文件: {self.mdz_path}", level="INFO")
+            # 解压完成后由 _on_unpack_finished 启动 Typora
             self.unpack_mdz()
-            self.launch_typora()
 
     def unpack_mdz(self):
+        """
+        使用 QProcess 异步调用 7z 解压，解压期间界面保持响应，完成后自动启动 Typora。
+        """
+        if self.unpack_proc is not None:
+            self.append_log("解压正在进行中，请稍候。", level="WARNING")
+            return
         seven_zip = resolve_path(self.config["7zip_path"])
         if not os.path.exists(seven_zip):
             self.append_log(f"错误: 7-Zip 未找到: {seven_zip}", level="ERROR")
             QtWidgets.QMessageBox.critical(self, "错误", f"7-Zip 未找到: {seven_zip}")
             return
 
-        self.temp_dir = os.path.join(tempfile.gettempdir(), f"mdz_temp_{uuid.uuid4()}")
-        os.makedirs(self.temp_dir, exist_ok=True)
+        if not self._prepare_temp_dir():
+            return
 
-        try:
-            subprocess.run([seven_zip, "x", "-y", f"-o{self.temp_dir}", self.mdz_path],
-                           check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._unpack_progress = -1
+        self.unpack_proc = QtCore.QProcess(self)
+        self.unpack_proc.readyReadStandardOutput.connect(self._on_unpack_output)
+        self.unpack_proc.finished.connect(self._on_unpack_finished)
+        self.unpack_proc.errorOccurred.connect(self._on_unpack_error)
+        # -mmt=on: 多线程解压；-bso0: 不输出逐文件列表；-bsp1: 仅将进度输出到 stdout，便于实时显示
+        self.unpack_proc.start(seven_zip, ["x", "-y", "-mmt=on", "-bso0", "-bsp1",
+                                           f"-o{self.temp_dir}", self.mdz_path])
+        self._update_actions()
+
+    def _on_unpack_output(self):
+        # 边解压边读取 7z 输出，解析进度百分比，每前进10%记录一次
+        if not self.unpack_proc:
+            return
+        text = bytes(self.unpack_proc.readAllStandardOutput()).decode(errors="replace")
+        percents = re.findall(r"(\d+)%", text)
+        if percents:
+            percent = int(percents[-1])
+            if percent // 10 > self._unpack_progress // 10:
+                self._unpack_progress = percent
+                self.append_log(f"解压进度: {percent}%", level="INFO")
+
+    def _on_unpack_finished(self, exit_code, exit_status):
+        proc = self.unpack_proc
+        self.unpack_proc = None
+        proc.deleteLater()
+        self._update_actions()
+        if exit_status == QtCore.QProcess.NormalExit and exit_code == 0:
+            # 刚解压出的文件与 .mdz 内容一致，作为增量打包的基准
+            self._last_packed_sig = tree_signature(self.temp_dir)
             self.append_log(f"已解压到临时目录: {self.temp_dir}", level="INFO")
-        except subprocess.CalledProcessError as e:
-            logging.error(f"解压失败: {e}")
-            self.append_log(f"错误: 解压 .mdz 文件失败: {e}", level="ERROR")
-            QtWidgets.QMessageBox.critical(self, "解压失败", f"解压 .mdz 文件失败: {e}")
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-            self.temp_dir = None
+            self.launch_typora()
+            return
+        err = bytes(proc.readAllStandardError()).decode(errors="replace").strip()
+        self._unpack_failed(f"7z 退出码 {exit_code} {err}")
+
+    def _on_unpack_error(self, error):
+        # 进程无法启动时不会发出 finished 信号，需单独处理
+        if error == QtCore.QProcess.FailedToStart and self.unpack_proc:
+            msg = self.unpack_proc.errorString()
+            self.unpack_proc.deleteLater()
+            self.unpack_proc = None
+            self._update_actions()
+            self._unpack_failed(msg)
+
+    def _unpack_failed(self, msg):
+        logging.error(f"解压失败: {msg}")
+        self.append_log(f"错误: 解压 .mdz 文件失败: {msg}", level="ERROR")
+        QtWidgets.QMessageBox.critical(self, "解压失败", f"解压 .mdz 文件失败: {msg}")
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        self.temp_dir = None
 
     def launch_typora(self):
+        if self.typora_process is not None:
+            self.append_log("Typora 正在编辑另一个文档，请先关闭。", level="WARNING")
+            return
         typora_path = resolve_path(self.config["typora_path"])
         if not os.path.exists(typora_path):
             self.append_log(f"错误: Typora 未找到: {typora_path}", level="ERROR")
@@ -236,43 +588,78 @@ class MDZLauncher(QtWidgets.QMainWindow):
         # 启动文件监控
         self.start_file_monitor()
 
-        try:
-            self.typora_process = subprocess.Popen([typora_path, document_path])
-            self.append_log("Typora 已启动，保存时将自动打包...", level="INFO")
-            self.monitor_typora()
-        except Exception as e:
-            logging.error(f"启动 Typora 失败: {e}")
-            self.append_log(f"错误: 无法启动 Typora: {e}", level="ERROR")
-            QtWidgets.QMessageBox.critical(self, "错误", f"无法启动 Typora: {e}")
+        # 使用 QProcess 启动 Typora，进程退出时 finished 信号立即通知，无需轮询
+        self.typora_process = QtCore.QProcess(self)
+        self.typora_process.finished.connect(self._on_typora_exit)
+        self.typora_process.errorOccurred.connect(self._on_typora_error)
+        # Typora 的输出无人读取，丢弃以免管道缓冲区写满后阻塞 Typora
+        self.typora_process.setStandardOutputFile(QtCore.QProcess.nullDevice())
+        self.typora_process.setStandardErrorFile(QtCore.QProcess.nullDevice())
+        self.typora_process.start(typora_path, [document_path])
+        self._update_actions()
+        self.append_log("Typora 已启动，保存时将自动打包...", level="INFO")
 
     def start_file_monitor(self):
         # 启动对 temp_dir 的document.md文件监控
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
-            self.observer = None
-        self.event_handler = DocumentSaveHandler(self)
-        self.observer = Observer()
-        self.observer.schedule(self.event_handler, self.temp_dir, recursive=False)
-        self.observer.start()
+        self.stop_file_monitor()
+        doc_path = os.path.join(self.temp_dir, "document.md")
+        self.fs_watcher = QtCore.QFileSystemWatcher([self.temp_dir, doc_path], self)
+        self.fs_watcher.fileChanged.connect(self._on_doc_changed)
+        self.fs_watcher.directoryChanged.connect(self._on_temp_dir_changed)
         self.append_log("文件监控已启动。", level="INFO")
 
-    def monitor_typora(self):
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self.check_typora)
-        self.timer.start(1000)
-
-    def check_typora(self):
-        if self.typora_process and self.typora_process.poll() is not None:
-            self.timer.stop()
-            # Typora已关闭，进行最终打包并清理
-            self.pack_mdz(final=True)
-            # 停止监控
-            if self.observer:
-                self.observer.stop()
-                self.observer.join()
-                self.observer = None
-            self.append_log("Typora 已关闭，最终打包完成。", level="INFO")
+    def stop_file_monitor(self):
+        self._debounce_timer.stop()
+        if self.fs_watcher:
+            paths = self.fs_watcher.files() + self.fs_watcher.directories()
+            if paths:
+                self.fs_watcher.removePaths(paths)
+            self.fs_watcher.deleteLater()
+            self.fs_watcher = None
+
+    def _on_doc_changed(self, path):
+        """
+        document.md 被修改时触发打包。
+        """
+        # 编辑器以"写临时文件再重命名"方式保存时，Qt 会移除对原文件的监控，需重新添加
+        if path not in self.fs_watcher.files() and os.path.exists(path):
+            self.fs_watcher.addPath(path)
+        # 防抖处理：重新开始计时，连续修改期间不打包，仅在最后一次修改后触发
+        self._debounce_timer.start()
+
+    def _on_temp_dir_changed(self, path):
+        # 重命名覆盖瞬间 document.md 可能暂不存在，待其重新出现后补回监控并视为一次保存
+        doc_path = os.path.join(path, "document.md")
+        if doc_path not in self.fs_watcher.files() and os.path.exists(doc_path):
+            self.fs_watcher.addPath(doc_path)
+            self._on_doc_changed(doc_path)
+
+    def _on_typora_exit(self, exit_code, exit_status):
+        # 只处理当前会话的 Typora 进程，已结束的旧进程的信号直接忽略
+        proc = self.sender()
+        if proc is not self.typora_process:
+            return
+        self.typora_process = None
+        proc.deleteLater()
+        # Typora已关闭，进行最终打包并清理
+        self.pack_mdz(final=True)
+        # 停止监控
+        self.stop_file_monitor()
+        self._update_actions()
+        self.append_log("Typora 已关闭，最终打包完成。", level="INFO")
+
+    def _on_typora_error(self, error):
+        # 启动失败时不会发出 finished 信号
+        proc = self.sender()
+        if error == QtCore.QProcess.FailedToStart and proc is self.typora_process:
+            msg = proc.errorString()
+            self.typora_process = None
+            proc.deleteLater()
+            self.stop_file_monitor()
+            self._update_actions()
+            logging.error(f"启动 Typora 失败: {msg}")
+            self.append_log(f"错误: 无法启动 Typora: {msg}", level="ERROR")
+            QtWidgets.QMessageBox.critical(self, "错误", f"无法启动 Typora: {msg}")
 
     def pack_on_save(self):
         # 在保存事件中调用的打包，这不是最终关闭打包，因此final=False
@@ -282,43 +669,81 @@ class MDZLauncher(QtWidgets.QMainWindow):
         if not self.temp_dir or not self.mdz_path:
             self.append_log("错误: 临时目录或 .mdz 文件路径未设置。", level="ERROR")
             return
-        seven_zip = resolve_path(self.config["7zip_path"])
-        if not os.path.exists(seven_zip):
-            self.append_log(f"错误: 7-Zip 未找到: {seven_zip}", level="ERROR")
-            QtWidgets.QMessageBox.critical(self, "错误", f"7-Zip 未找到: {seven_zip}")
-            return
 
         try:
-            # 这里先打包到一个临时文件，然后替换原mdz，避免中途损坏
-            temp_mdz = self.mdz_path + ".temp"
-            if os.path.exists(temp_mdz):
-                os.remove(temp_mdz)
-
-            subprocess.run([seven_zip, "a", "-tzip", "-mx9", temp_mdz, f"{self.temp_dir}\\*"],
-                           check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            # 替换原文件
-            shutil.move(temp_mdz, self.mdz_path)
+            # 保存时的中间打包很快会被覆盖，使用最快的压缩级别；最终关闭时才使用最高压缩
+            compress_level = 9 if final else 1
+            sig = tree_signature(self.temp_dir)
+            if sig == self._last_packed_sig and not (final and self._mdz_needs_repack):
+                # 与上次打包时完全一致（如未修改直接 Ctrl+S），无需重新打包
+                self.append_log("无变化，跳过打包", level="INFO")
+                if not final:
+                    return
+            elif not final and self._last_packed_sig and os.path.exists(self.mdz_path):
+                # 保存时仅把自上次打包后变化的文件追加进现有 .mdz
+                changed = [arcname for arcname, stat in sig.items()
+                           if stat != self._last_packed_sig.get(arcname)]
+                append_to_zip(self.mdz_path, self.temp_dir, changed, compress_level)
+                self._mdz_needs_repack = True
+            else:
+                # 这里先打包到一个临时文件，然后替换原mdz，避免中途损坏
+                temp_mdz = self.mdz_path + ".temp"
+                if os.path.exists(temp_mdz):
+                    os.remove(temp_mdz)
+
+                # .mdz 即 ZIP 格式，直接在进程内并行压缩，无需启动 7z
+                build_zip(self.temp_dir, temp_mdz, compress_level)
+                # 替换原文件
+                os.replace(temp_mdz, self.mdz_path)
+                self._mdz_needs_repack = not final
+            self._last_packed_sig = sig
 
             if final:
                 self.append_log("已重新打包 .mdz 文件（最终关闭）。", level="INFO")
-                self.toaster.show_toast("MDZ Launcher", "成功更新 .mdz 文件", duration=5, threaded=True)
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
-                self.temp_dir = None
+                self.tray.showMessage("MDZ Launcher", "成功更新 .mdz 文件", QtWidgets.QSystemTrayIcon.Information, 5000)
+                self._discard_temp_dir()
             else:
                 # 中间保存打包，不清理temp_dir，不给出关闭提示
                 self.append_log("已自动打包 .mdz 文件（保存时）。", level="INFO")
 
-        except subprocess.CalledProcessError as e:
+        except (OSError, zipfile.BadZipFile) as e:
             logging.error(f"打包失败: {e}")
             self.append_log(f"错误: 重新打包 .mdz 文件失败: {e}", level="ERROR")
             if final and self.temp_dir:
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
-                self.temp_dir = None
+                self._discard_temp_dir()
+
+    def _discard_temp_dir(self):
+        # 先把 work 目录改名移开，再交给线程池在后台删除，界面提示可立即显示；
+        # 改名后下一次新建/打开可以立即复用 work 路径，不会与后台删除冲突
+        trash_dir = os.path.join(self._session_temp_root, f"trash_{uuid.uuid4().hex}")
+        done = None
+        try:
+            os.rename(self.temp_dir, trash_dir)
+        except OSError:
+            # 改名失败则只能原地删除 work，删除完成前 _prepare_temp_dir 不会复用它
+            trash_dir = self.temp_dir
+            done = self._work_discard = threading.Event()
+        QtCore.QThreadPool.globalInstance().start(_RmtreeRunnable(trash_dir, done))
+        self.temp_dir = None
+
+    def closeEvent(self, event):
+        # Typora 作为子进程运行，关闭启动器会连带结束 Typora 并跳过最终打包
+        if self.typora_process and self.typora_process.state() != QtCore.QProcess.NotRunning:
+            QtWidgets.QMessageBox.information(self, "提示", "请先关闭 Typora，待最终打包完成后再退出。")
+            event.ignore()
+            return
+        # 关闭窗口时终止尚未完成的解压进程
+        if self.unpack_proc and self.unpack_proc.state() != QtCore.QProcess.NotRunning:
+            self.unpack_proc.finished.disconnect()
+            self.unpack_proc.kill()
+            self.unpack_proc.waitForFinished(1000)
+        super().closeEvent(event)
 
     def clear_log(self):
         """
         清除日志视图中的所有内容。
         """
+        self._log_buffer.clear()
         self.log_view.clear()
         self.append_log("日志已清除。", level="INFO")
 
@@ -422,7 +847,6 @@ def main():
             window.mdz_path = mdz_file
             window.append_log(f"通过命令行打开 .mdz 文件: {window.mdz_path}", level="INFO")
             window.unpack_mdz()
-            window.launch_typora()
         else:
             QtWidgets.QMessageBox.warning(window, "无效文件", "传入的文件不是有效的 .mdz 文件。")
 
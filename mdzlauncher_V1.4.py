@@ -9,21 +9,36 @@ import json
 import logging
 import time
 import traceback
+import warnings
+import errno
+import ctypes
+import hashlib
+from xml.sax.saxutils import escape
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from collections import deque
 
 from PyQt5 import QtWidgets, QtGui, QtCore
-from win10toast import ToastNotifier
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileMovedEvent
+from watchdog.events import FileSystemEventHandler, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED
+
+# 迁移旧版 JSON 配置时优先使用 orjson 读取，未安装时回退到标准库 json
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 #######################################
 # 全局配置
 #######################################
 app_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+# 旧版本的 JSON 配置文件，首次运行时迁移到 QSettings 后删除
 CONFIG_FILE = os.path.join(app_dir, "mdz_launcher_config.json")
 LOG_FILE = os.path.join(app_dir, "mdz_launcher.log")
 
 default_config = {
-    "7zip_path": os.path.join("7-Zip", "7z.exe"),
     "typora_path": os.path.join("typora", "Typora.exe")
 }
 
@@ -37,23 +52,54 @@ logging.basicConfig(
 #######################################
 # 工具函数
 #######################################
+def _settings():
+    """
+    配置保存在用户目录下的 INI 文件中（QSettings 以临时文件 + 重命名的方式写入），
+    不受程序目录所在云同步盘的锁定影响。
+    """
+    return QtCore.QSettings(QtCore.QSettings.IniFormat, QtCore.QSettings.UserScope, "MDZLauncher", "mdzlauncher")
+
+def _migrate_json_config(qs):
+    """
+    将旧版 JSON 配置写入 QSettings，并记录 migrated 标记，成功后删除 JSON 文件。
+    JSON 文件删除失败（如程序目录只读）时凭 migrated 标记不再重复迁移，避免覆盖之后保存的配置。
+    """
+    try:
+        with open(CONFIG_FILE, "rb") as f:
+            old_config = _loads(f.read())
+        for key, value in old_config.items():
+            qs.setValue(key, value)
+        qs.setValue("migrated", True)
+        qs.sync()
+    except Exception as e:
+        logging.error(f"迁移旧配置失败: {e}")
+        return
+    if qs.status() != QtCore.QSettings.NoError:
+        logging.error(f"迁移旧配置失败: {qs.fileName()}")
+        return
+    try:
+        os.remove(CONFIG_FILE)
+    except OSError as e:
+        logging.error(f"删除旧配置文件失败: {e}")
+
 def load_config():
     config = default_config.copy()
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                user_config = json.load(f)
-                config.update(user_config)
-        except Exception as e:
-            logging.error(f"加载配置失败: {e}")
+    qs = _settings()
+    if not qs.value("migrated", False, type=bool) and os.path.exists(CONFIG_FILE):
+        _migrate_json_config(qs)
+    # 旧版本配置中的 7-Zip 路径已不再使用
+    qs.remove("7zip_path")
+    for key, value in default_config.items():
+        config[key] = qs.value(key, value, type=type(value))
     return config
 
 def save_config(config):
-    try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        logging.error(f"保存配置失败: {e}")
+    qs = _settings()
+    for key, value in config.items():
+        qs.setValue(key, value)
+    qs.sync()
+    if qs.status() != QtCore.QSettings.NoError:
+        logging.error(f"保存配置失败: {qs.fileName()}")
 
 def resolve_path(path):
     if not os.path.isabs(path):
@@ -64,81 +110,475 @@ def resolve_path(path):
             return path
     return path
 
-def safe_move(src, dst, attempts=5, wait=0.5, logger=None):
+MOVEFILE_REPLACE_EXISTING = 0x1
+MOVEFILE_WRITE_THROUGH = 0x8
+# SHFileOperationW：删除操作，且不显示任何进度/确认/错误界面
+FO_DELETE = 0x3
+FOF_NO_UI = 0x614
+# 系统通知使用的 AppUserModelID
+TOAST_AUMID = "MDZLauncher"
+
+def register_aumid(aumid, display_name):
+    """
+    为未打包的桌面程序注册 AppUserModelID（写入 HKCU，无需开始菜单快捷方式）。
+    未注册的 ID 发出的通知会被 Windows 静默丢弃。成功返回 True。
+    """
+    if sys.platform != "win32":
+        return False
+    import winreg
+    try:
+        with winreg.CreateKey(winreg.HKEY_CURRENT_USER, rf"Software\Classes\AppUserModelId\{aumid}") as key:
+            winreg.SetValueEx(key, "DisplayName", 0, winreg.REG_SZ, display_name)
+    except OSError as e:
+        logging.error(f"注册 AppUserModelID 失败: {e}")
+        return False
+    return True
+
+def move_file_ex(src, dst):
+    """
+    Windows 下调用 MoveFileExW 原子替换目标文件（同一卷上的重命名，写穿透后返回）。
+    非 Windows 平台或调用失败时返回 False。
+    """
+    if sys.platform != "win32":
+        return False
+    from ctypes import wintypes
+    move = ctypes.windll.kernel32.MoveFileExW
+    move.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD]
+    move.restype = wintypes.BOOL
+    return bool(move(src, dst, MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH))
+
+def safe_move(src, dst, attempts=5, wait=0.5, logger=None, debug=False):
     """
     尝试多次 move src -> dst，以处理云同步软件锁定等问题。
+    先尝试 MoveFileExW 原子替换，失败后再用 os.replace 重试，等待时间按指数退避。
     :param src: 源文件路径
     :param dst: 目标文件路径
     :param attempts: 最大重试次数
-    :param wait: 每次失败后等待的秒数
+    :param wait: 第一次失败后等待的秒数，之后每次翻倍
     :param logger: 用于记录日志的函数
+    :param debug: 是否输出 [DEBUG] 日志
     :return: True 表示成功移动，False 表示多次重试后仍失败
     """
+    if move_file_ex(src, dst):
+        if logger and debug:
+            logger("[DEBUG] safe_move succeeded via MoveFileExW", "INFO")
+        return True
     for i in range(attempts):
         try:
-            shutil.move(src, dst)
-            if logger:
+            try:
+                os.replace(src, dst)
+            except OSError as e:
+                # 跨卷时无法重命名，退回到复制+删除
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(src, dst)
+            if logger and debug:
                 logger(f"[DEBUG] safe_move succeeded on attempt #{i+1}", "INFO")
             return True
         except (PermissionError, OSError) as e:
             if logger:
                 logger(f"[WARN] safe_move attempt #{i+1} failed: {e}", "WARNING")
-            time.sleep(wait)
+            if i < attempts - 1:
+                time.sleep(wait)
+                wait *= 2
     if logger:
         logger("[ERROR] safe_move failed after multiple attempts", "ERROR")
     return False
 
+def file_hash(path):
+    """
+    计算文件内容的 blake2b 摘要（16 字节），用于判断保存前后内容是否变化。
+    """
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).digest()
+        h = hashlib.blake2b(digest_size=16)
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+        return h.digest()
+
+# ZIP 通用标志位 bit 11：文件名为 UTF-8 编码
+ZIP_FLAG_UTF8 = 0x800
+
+def oem_encoding():
+    """
+    返回系统 OEM 代码页（如简体中文 Windows 为 cp936）。7z 生成 ZIP 时，
+    非 ASCII 文件名按该代码页存储且不设置 UTF-8 标志。
+    """
+    if sys.platform == "win32":
+        return f"cp{ctypes.windll.kernel32.GetOEMCP()}"
+    return "utf-8"
+
+def extract_zip(zip_path, dst_dir):
+    """
+    解压 .mdz 到 dst_dir。未设置 UTF-8 标志的文件名按 OEM 代码页解码，
+    而不是 zipfile 默认的 cp437，旧版由 7z 打包的中文资源名才能正确还原。
+    """
+    encoding = oem_encoding()
+    with zipfile.ZipFile(zip_path) as zf:
+        for info in zf.infolist():
+            if not info.flag_bits & ZIP_FLAG_UTF8:
+                try:
+                    name = info.orig_filename.encode("cp437").decode(encoding)
+                except UnicodeError:
+                    name = None
+                if name:
+                    # 与 ZipInfo 一致：在 Windows 上把 \ 统一为 /
+                    info.filename = name.replace(os.sep, "/") if os.sep != "/" else name
+            zf.extract(info, dst_dir)
+
+def iter_files(root):
+    """
+    用 os.scandir 遍历目录树（DirEntry 自带类型信息，无需额外 stat）。
+    :return: 逐个产出 (路径, 是否为目录)
+    """
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    yield entry.path, True
+                else:
+                    yield entry.path, False
+
+def remove_tree(path):
+    """
+    删除整个目录树。Windows 下调用 SHFileOperationW 一次性删除，
+    失败或非 Windows 平台时回退到 shutil.rmtree。
+    """
+    if sys.platform == "win32":
+        from ctypes import wintypes
+
+        class SHFILEOPSTRUCTW(ctypes.Structure):
+            # shellapi.h 在 32 位下以 1 字节对齐该结构体，64 位下为默认对齐
+            if ctypes.sizeof(ctypes.c_void_p) == 4:
+                _pack_ = 1
+            _fields_ = [
+                ("hwnd", wintypes.HWND),
+                ("wFunc", wintypes.UINT),
+                ("pFrom", wintypes.LPCWSTR),
+                ("pTo", wintypes.LPCWSTR),
+                ("fFlags", ctypes.c_ushort),
+                ("fAnyOperationsAborted", wintypes.BOOL),
+                ("hNameMappings", ctypes.c_void_p),
+                ("lpszProgressTitle", wintypes.LPCWSTR),
+            ]
+
+        op = SHFILEOPSTRUCTW()
+        op.wFunc = FO_DELETE
+        # pFrom 需以两个 \0 结尾，ctypes 会再补一个
+        op.pFrom = os.path.abspath(path) + "\0"
+        op.fFlags = FOF_NO_UI
+        if ctypes.windll.shell32.SHFileOperationW(ctypes.byref(op)) == 0 and not os.path.exists(path):
+            return
+    shutil.rmtree(path, ignore_errors=True)
+
+def deflate_file(path, level):
+    """
+    压缩单个文件（在线程池中执行，zlib 压缩期间会释放 GIL）。
+    :return: (crc32, 压缩后的数据, 原始大小)
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc = 0
+    size = 0
+    chunks = []
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            chunks.append(compressor.compress(block))
+    chunks.append(compressor.flush())
+    return crc, b"".join(chunks), size
+
+def write_deflated(zf, path, arcname, crc, data, size):
+    """
+    将已压缩好的数据作为一个条目写入 ZipFile，跳过 zipfile 自身的压缩流程。
+    """
+    zinfo = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size = size
+    zinfo.compress_size = len(data)
+    zinfo.CRC = crc
+    zinfo.header_offset = zf.fp.tell()
+    zf.fp.write(zinfo.FileHeader())
+    zf.fp.write(data)
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+    zf.start_dir = zf.fp.tell()
+
+def build_zip(src_dir, dst_path, level):
+    """
+    将 src_dir 打包为 dst_path。文件较多时各文件在线程池中并行压缩，
+    主线程按顺序写入条目和中央目录；同时在压缩中的文件数限制为线程数的两倍，
+    避免所有压缩结果同时驻留内存。
+    """
+    dirs = []
+    files = []
+    for full, is_dir in iter_files(src_dir):
+        (dirs if is_dir else files).append((full, os.path.relpath(full, src_dir)))
+
+    # strict_timestamps=False：1980 年以前的修改时间按 1980-01-01 记录，而不是抛出 ValueError
+    with zipfile.ZipFile(dst_path, "w", zipfile.ZIP_DEFLATED, compresslevel=level,
+                         strict_timestamps=False) as zf:
+        for full, arcname in dirs:
+            zf.write(full, arcname)
+        # 文件很少时线程池的开销不划算，直接单线程压缩
+        if len(files) < 4:
+            for full, arcname in files:
+                zf.write(full, arcname)
+            return
+        workers = os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for full, arcname in files:
+                pending.append((full, arcname, pool.submit(deflate_file, full, level)))
+                if len(pending) >= workers * 2:
+                    full, arcname, future = pending.popleft()
+                    write_deflated(zf, full, arcname, *future.result())
+            while pending:
+                full, arcname, future = pending.popleft()
+                write_deflated(zf, full, arcname, *future.result())
+
+def tree_signature(root):
+    """
+    返回 {归档名: (st_size, st_mtime_ns)}，用于找出自上次打包后变化的文件。
+    """
+    signature = {}
+    for full, is_dir in iter_files(root):
+        if not is_dir:
+            st = os.stat(full)
+            signature[os.path.relpath(full, root).replace(os.sep, "/")] = (st.st_size, st.st_mtime_ns)
+    return signature
+
+def append_to_zip(src_zip, dst_zip, src_dir, arcnames, level):
+    """
+    把 src_zip 复制为 dst_zip，再以追加模式写入 arcnames 中的文件，src_zip 本身不被改动。
+    同名条目会重复出现，解压时以最后一个为准。
+    """
+    shutil.copyfile(src_zip, dst_zip)
+    with warnings.catch_warnings():
+        # zipfile 对重复文件名会给出 UserWarning，这里是有意为之
+        warnings.simplefilter("ignore", UserWarning)
+        with zipfile.ZipFile(dst_zip, "a", zipfile.ZIP_DEFLATED, compresslevel=level,
+                             strict_timestamps=False) as zf:
+            for arcname in arcnames:
+                zf.write(os.path.join(src_dir, *arcname.split("/")), arcname)
+
+#######################################
+# 后台打包任务
+#######################################
+class PackSignals(QtCore.QObject):
+    """
+    PackJob 的信号载体（QRunnable 不是 QObject，不能直接定义信号）。
+    在主线程创建，工作线程发出的信号会排队回到主线程执行。
+    """
+    finished = QtCore.pyqtSignal(bool)
+
+class PackJob(QtCore.QRunnable):
+    """
+    在 QThreadPool 中执行打包 + safe_move，完成后通过 signals.finished 回到主线程。
+    保存时若有上次打包的 prev_sig，只把变化的文件追加到 .mdz 的副本中；
+    最终打包总是完整重建，同时去掉追加产生的重复条目。
+    """
+    def __init__(self, src_dir, mdz_path, level, final, doc_hash, logger, debug=False, prev_sig=None):
+        super().__init__()
+        # 由 MDZLauncher 持有引用，避免线程池与 Python 重复释放
+        self.setAutoDelete(False)
+        self.signals = PackSignals()
+        self.srcDir = src_dir
+        self.mdzPath = mdz_path
+        self.level = level
+        self.final = final
+        self.docHash = doc_hash
+        self.logger = logger
+        self.debug = debug
+        self.prevSig = prev_sig
+        # 本次打包时各文件的签名，成功后作为下一次增量打包的基准
+        self.signature = None
+
+    def run(self):
+        temp_mdz = self.mdzPath + ".temp"
+        # 无论出现什么异常都要发出 finished，否则 packInProgress 会一直为 True
+        success = False
+        try:
+            if os.path.exists(temp_mdz):
+                os.remove(temp_mdz)
+            # 先取签名再打包：打包期间又被修改的文件签名会不同，下次仍会追加
+            sig = tree_signature(self.srcDir)
+            # 有文件被删除时追加无法移除旧条目，只能完整重建
+            if (not self.final and self.prevSig and os.path.exists(self.mdzPath)
+                    and self.prevSig.keys() <= sig.keys()):
+                changed = [arcname for arcname, stat in sig.items() if stat != self.prevSig.get(arcname)]
+                if self.debug:
+                    self.logger(f"[DEBUG] incremental pack => {len(changed)} changed file(s)", "INFO")
+                append_to_zip(self.mdzPath, temp_mdz, self.srcDir, changed, self.level)
+            else:
+                build_zip(self.srcDir, temp_mdz, self.level)
+            self.signature = sig
+
+            # 多次重试移动 temp_mdz -> mdz_path
+            success = safe_move(
+                src=temp_mdz,
+                dst=self.mdzPath,
+                attempts=5,
+                wait=0.5,
+                logger=self.logger,
+                debug=self.debug
+            )
+            if not success:
+                self.logger("[ERROR] Failed to move .temp => .mdz after multiple attempts", "ERROR")
+        except Exception as e:
+            logging.error(f"打包失败: {e}\n{traceback.format_exc()}")
+            self.logger(f"错误: 重新打包 .mdz 文件失败: {e}", "ERROR")
+        finally:
+            self.signals.finished.emit(success)
+
 #######################################
 # 文件保存事件处理器
 #######################################
 class DocumentSaveHandler(FileSystemEventHandler):
+    """
+    处理 document.md 的保存事件。由 DebouncingEventHandler 包装，
+    只会收到 document.md 的 modified / moved 事件。
+    """
     def __init__(self, launcher):
         super().__init__()
         self.launcher = launcher
+        # 路径 -> (st_mtime_ns, st_size)，用于丢弃内容未变的重复事件
+        self._lastStat = {}
+
+    def _stat_changed(self, file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            # 保存过程中文件可能暂时不存在，等待后续事件
+            return False
+        key = (st.st_mtime_ns, st.st_size)
+        if self._lastStat.get(file_path) == key:
+            return False
+        self._lastStat[file_path] = key
+        return True
 
     def maybe_trigger_pack(self, file_path):
         base_name = os.path.basename(file_path).lower()
-        self.launcher.append_log(
-            f"[DEBUG] maybe_trigger_pack => base_name={base_name}", "INFO"
-        )
-        if "document.md" in base_name:
-            self.launcher.saveCount += 1
+        if self.launcher.debug_enabled:
             self.launcher.append_log(
-                f"[SAVE EVENT] Detected save #{self.launcher.saveCount} on {base_name} => docSaveDirty = True",
-                "INFO"
+                f"[DEBUG] maybe_trigger_pack => base_name={base_name}", "INFO"
             )
+        # 记录本批次的保存事件（watchdog 线程中执行，与主线程共享状态，需加锁）
+        with QtCore.QMutexLocker(self.launcher._stateMutex):
+            self.launcher._pendingEvents.add(file_path)
+            self.launcher.saveCount += 1
+            save_count = self.launcher.saveCount
             self.launcher.docSaveDirty = True
-            # 如果当前正在打包 => 只记录 docSaveDirty
-            if self.launcher.packInProgress:
+            pack_in_progress = self.launcher.packInProgress
+        self.launcher.append_log(
+            f"[SAVE EVENT] Detected save #{save_count} on {base_name} => docSaveDirty = True",
+            "INFO"
+        )
+        # 如果当前正在打包 => 只记录 docSaveDirty
+        if pack_in_progress:
+            if self.launcher.debug_enabled:
                 self.launcher.append_log("[DEBUG] packInProgress=True => skip reset_timer", "INFO")
-                return
-            # 否则正常触发防抖逻辑
-            self.launcher.reset_doc_save_timer()
-
-    def on_modified(self, event):
-        if event.is_directory:
             return
-        self.launcher.append_log(f"[DEBUG] on_modified => {event.src_path}", "INFO")
-        self.maybe_trigger_pack(event.src_path)
+        # 否则通过信号回到主线程触发防抖逻辑
+        self.launcher.docSaveRequested.emit()
 
-    def on_created(self, event):
-        if event.is_directory:
+    def on_modified(self, event):
+        if not self._stat_changed(event.src_path):
             return
-        self.launcher.append_log(f"[DEBUG] on_created => {event.src_path}", "INFO")
+        if self.launcher.debug_enabled:
+            self.launcher.append_log(f"[DEBUG] on_modified => {event.src_path}", "INFO")
         self.maybe_trigger_pack(event.src_path)
 
     def on_moved(self, event):
-        if isinstance(event, FileMovedEvent):
+        if not self._stat_changed(event.dest_path):
+            return
+        if self.launcher.debug_enabled:
             self.launcher.append_log(
                 f"[DEBUG] on_moved => {event.src_path} -> {event.dest_path}",
                 "INFO"
             )
-            self.maybe_trigger_pack(event.dest_path)
+        self.maybe_trigger_pack(event.dest_path)
+
+class DebouncingEventHandler(FileSystemEventHandler):
+    """
+    在 watchdog 线程侧合并事件：同一路径在 delay 秒内的多次事件只转发最后一次。
+    只有 document.md 的 modified / moved 事件进入队列（opened / closed 等事件会覆盖掉
+    真正的修改事件，因此直接丢弃），所有路径共用一个后台线程按截止时间转发。
+    """
+    def __init__(self, handler, delay=0.2):
+        super().__init__()
+        self.handler = handler
+        self.delay = delay
+        # 路径 -> (截止时间, 事件)
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="mdz-debounce", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _document_path(event):
+        # 返回事件涉及的 document.md 路径；不需要处理的事件返回 None
+        if event.is_directory:
+            return None
+        if event.event_type == EVENT_TYPE_MODIFIED:
+            path = event.src_path
+        elif event.event_type == EVENT_TYPE_MOVED:
+            path = event.dest_path
+        else:
+            return None
+        return path if os.path.basename(path).lower().endswith("document.md") else None
+
+    def dispatch(self, event):
+        # 先过滤再排队，临时文件等无关事件不会进入防抖逻辑
+        key = self._document_path(event)
+        if key is None:
+            return
+        with self._cond:
+            self._pending[key] = (time.monotonic() + self.delay, event)
+            self._cond.notify()
+
+    def _take_due_events(self):
+        # 在持有 _cond 时调用；等待到有事件到期后取出，已停止时返回 None
+        while not self._stopped:
+            if not self._pending:
+                self._cond.wait()
+                continue
+            now = time.monotonic()
+            due = [key for key, (deadline, _) in self._pending.items() if deadline <= now]
+            if due:
+                return [self._pending.pop(key)[1] for key in due]
+            self._cond.wait(min(deadline for deadline, _ in self._pending.values()) - now)
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                events = self._take_due_events()
+            if events is None:
+                return
+            for event in events:
+                self.handler.dispatch(event)
+
+    def cancel(self):
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify()
+        self._thread.join(timeout=1)
 
 #######################################
 # 主窗体
 #######################################
 class MDZLauncher(QtWidgets.QMainWindow):
+    # watchdog 线程检测到保存后发出，由主线程重置防抖定时器
+    docSaveRequested = QtCore.pyqtSignal()
+    # (日志文本, 级别)；append_log 可在任意线程调用，经排队连接交给主线程的 _renderLog
+    logSignal = QtCore.pyqtSignal(str, str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("MDZ Launcher")
@@ -148,17 +588,32 @@ class MDZLauncher(QtWidgets.QMainWindow):
         self.temp_dir = None
         self.mdz_path = None
         self.typora_process = None
-        self.toaster = ToastNotifier()
+        # 首次弹出通知时创建，之后复用；winsdk 不可用时使用托盘图标
+        self._toastNotifier = None
+        self._toastChecked = False
+        self._trayIcon = None
+        # 是否输出 [DEBUG] 日志；关闭时跳过调试信息的格式化与写入
+        self.debug_enabled = False
+        # append_log 的时间戳缓存（精确到秒）
+        self._lastTs = 0
+        self._lastTsStr = ""
 
         # 保存事件 & 打包相关
         self.docSaveDirty = False
         self.packInProgress = False  # 是否正在打包
         self.saveCount = 0
-
-        self.resetCount = 0
-        self.max_resets = 5
-        self.lastResetStart = 0.0
-        self.max_delay_sec = 10
+        # 上次成功打包时 document.md 的内容摘要
+        self._lastDocHash = None
+        # 上次成功打包（或解压）时各文件的签名，保存时据此增量打包
+        self._lastPackedSig = {}
+
+        # 尚未打包的保存事件（路径集合），由 watchdog 线程写入、主线程取出
+        self._pendingEvents = set()
+        # 当前在线程池中执行的打包任务；Typora 关闭时若仍在打包，最终打包排在其后
+        self._packJob = None
+        self._finalPackPending = False
+        # 保护 _pendingEvents / docSaveDirty / saveCount / packInProgress / _finalPackPending
+        self._stateMutex = QtCore.QMutex()
 
         self.initUI()
 
@@ -166,24 +621,58 @@ class MDZLauncher(QtWidgets.QMainWindow):
         self.observer = None
         self.event_handler = None
 
-        # 防抖定时器
-        self.docSaveTimer = QtCore.QTimer()
+        # 防抖定时器：每次保存事件都重新计时，静默2秒后打包
+        self.docSaveTimer = QtCore.QTimer(self)
         self.docSaveTimer.setSingleShot(True)
         self.docSaveTimer.setInterval(2000)
         self.docSaveTimer.timeout.connect(self.onDocSaveTimerTimeout)
 
+        # 最长等待定时器：一批事件的第一次事件启动，之后不再重置，保证连续保存时最迟10秒打包一次
+        self._maxWaitTimer = QtCore.QTimer(self)
+        self._maxWaitTimer.setSingleShot(True)
+        self._maxWaitTimer.setInterval(10000)
+        self._maxWaitTimer.timeout.connect(self.onMaxWaitTimerTimeout)
+
+        self.docSaveRequested.connect(self.reset_doc_save_timer)
+
+        self._refresh_paths()
+
+    def _refresh_paths(self):
+        """
+        解析并缓存 Typora 路径，只在启动和修改配置后执行一次。
+        Typora 不存在时禁用新建/打开，直到在设置中配置正确的路径。
+        """
+        self._typoraExe = resolve_path(self.config["typora_path"])
+        self._typoraFound = os.path.exists(self._typoraExe)
+        self._update_actions()
+        if not self._typoraFound:
+            self.append_log(f"错误: Typora 未找到: {self._typoraExe}，请在“设置 > 配置路径”中修改", "ERROR")
+
+    def _session_busy(self):
+        # Typora 仍在编辑，或最终打包尚未完成
+        return self.typora_process is not None or self._packJob is not None or self._finalPackPending
+
+    def _update_actions(self):
+        """
+        Typora 不存在或当前文档的编辑会话尚未结束时禁用新建/打开，
+        避免新文档替换掉仍在使用的 temp_dir / mdz_path。
+        """
+        enabled = self._typoraFound and not self._session_busy()
+        self.newAction.setEnabled(enabled)
+        self.openAction.setEnabled(enabled)
+
     def initUI(self):
         menubar = self.menuBar()
         fileMenu = menubar.addMenu("文件")
 
-        newAction = QtWidgets.QAction("新建 .mdz 文件", self)
-        newAction.triggered.connect(self.new_mdz)
-        fileMenu.addAction(newAction)
+        self.newAction = QtWidgets.QAction("新建 .mdz 文件", self)
+        self.newAction.triggered.connect(self.new_mdz)
+        fileMenu.addAction(self.newAction)
 
-        openAction = QtWidgets.QAction("打开 .mdz 文件", self)
-        openAction.setShortcut("Ctrl+O")
-        openAction.triggered.connect(self.open_mdz)
-        fileMenu.addAction(openAction)
+        self.openAction = QtWidgets.QAction("打开 .mdz 文件", self)
+        self.openAction.setShortcut("Ctrl+O")
+        self.openAction.triggered.connect(self.open_mdz)
+        fileMenu.addAction(self.openAction)
 
         settingsMenu = menubar.addMenu("设置")
         configAction = QtWidgets.QAction("配置路径", self)
@@ -197,8 +686,19 @@ class MDZLauncher(QtWidgets.QMainWindow):
         self.log_view = QtWidgets.QTextEdit()
         self.log_view.setReadOnly(True)
         self.log_view.setPlaceholderText("日志信息将在此显示...")
+        # 最多保留5000条日志，超出后自动丢弃最早的记录
+        self.log_view.document().setMaximumBlockCount(5000)
         layout.addWidget(self.log_view)
 
+        # 日志缓冲：100ms 内的日志合并为一次写入，无论事件多频繁，界面每秒最多刷新10次
+        self._logBuf = deque()
+        self._logPending = False
+        self._logFlushTimer = QtCore.QTimer(self)
+        self._logFlushTimer.setSingleShot(True)
+        self._logFlushTimer.setInterval(100)
+        self._logFlushTimer.timeout.connect(self._flushLog)
+        self.logSignal.connect(self._renderLog, QtCore.Qt.QueuedConnection)
+
         button_layout = QtWidgets.QHBoxLayout()
         self.clear_log_button = QtWidgets.QPushButton("清除日志")
         self.clear_log_button.clicked.connect(self.clear_log)
@@ -212,60 +712,86 @@ class MDZLauncher(QtWidgets.QMainWindow):
         central_widget.setLayout(layout)
 
     def append_log(self, message, level="INFO"):
-        timestamp = QtCore.QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
+        # 时间戳在调用时记录，渲染可能延后最多 100ms；同一秒内复用已格式化的字符串
+        now = int(time.time())
+        if now != self._lastTs:
+            self._lastTsStr = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+            self._lastTs = now
+        self.logSignal.emit(f"[{self._lastTsStr}] {message}", level)
+
+    def _renderLog(self, text, level):
         color_map = {
             "INFO": "black",
             "WARNING": "orange",
             "ERROR": "red"
         }
         color = color_map.get(level, "black")
-        self.log_view.append(f'<span style="color:{color};">[{timestamp}] {message}</span>')
+        self._logBuf.append(f'<span style="color:{color};">{text}</span>')
+        # 节流：已有刷新排队时只追加到缓冲，由定时器统一写入
+        if not self._logPending:
+            self._logPending = True
+            self._logFlushTimer.start()
+
+    def _flushLog(self):
+        self._logPending = False
+        if not self._logBuf:
+            return
+        self.log_view.setUpdatesEnabled(False)
+        cursor = self.log_view.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.beginEditBlock()
+        while self._logBuf:
+            # 每条日志单独成段，与 QTextEdit.append 一致，也便于按段数限制日志长度
+            if not self.log_view.document().isEmpty():
+                cursor.insertBlock()
+            cursor.insertHtml(self._logBuf.popleft())
+        cursor.endEditBlock()
+        self.log_view.setUpdatesEnabled(True)
         self.log_view.moveCursor(QtGui.QTextCursor.End)
 
     ##################################
     # 防抖定时器：重置逻辑
     ##################################
     def reset_doc_save_timer(self):
-        self.resetCount += 1
-        if self.resetCount == 1:
-            self.lastResetStart = time.time()
-
-        forced = False
-        if self.resetCount >= self.max_resets:
-            forced = True
-            self.append_log(
-                f"[FORCE] Reached max_resets={self.max_resets}. Forcing immediate pack_on_save",
-                "INFO"
-            )
-        elif time.time() - self.lastResetStart > self.max_delay_sec:
-            forced = True
-            self.append_log(
-                f"[FORCE] Exceeded max_delay_sec={self.max_delay_sec}s => immediate pack_on_save",
-                "INFO"
-            )
-
-        if forced:
-            self.docSaveDirty = False
-            self.resetCount = 0
-            self.lastResetStart = 0.0
-            self.pack_on_save()
-            return
-
-        # 使用定时器
-        if self.docSaveTimer.isActive():
+        # 空闲定时器每次都重新计时；最长等待定时器只在一批事件的第一次启动
+        if self.debug_enabled and self.docSaveTimer.isActive():
             self.append_log("[DEBUG] docSaveTimer stopped for reset", "INFO")
-            self.docSaveTimer.stop()
         self.docSaveTimer.start()
+        if not self._maxWaitTimer.isActive():
+            self._maxWaitTimer.start()
 
     def onDocSaveTimerTimeout(self):
-        self.append_log("[DEBUG] docSaveTimer timeout triggered", "INFO")
-        if self.docSaveDirty:
-            self.docSaveDirty = False
-            self.resetCount = 0
-            self.lastResetStart = 0.0
-            self.append_log("[DEBUG] docSaveDirty is True => calling pack_on_save", "INFO")
+        if self.debug_enabled:
+            self.append_log("[DEBUG] docSaveTimer timeout triggered", "INFO")
+        self.flush_pending_saves()
+
+    def onMaxWaitTimerTimeout(self):
+        self.append_log("[FORCE] Reached max wait => immediate pack_on_save", "INFO")
+        self.flush_pending_saves()
+
+    def flush_pending_saves(self):
+        """
+        取出本批次的全部保存事件并只打包一次。
+        """
+        self.docSaveTimer.stop()
+        self._maxWaitTimer.stop()
+        with QtCore.QMutexLocker(self._stateMutex):
+            # 正在打包时不取出事件，留待 _on_pack_finished 重新启动防抖定时器后再处理
+            if self.packInProgress:
+                pending = None
+            else:
+                pending = self._pendingEvents
+                self._pendingEvents = set()
+                if pending:
+                    self.docSaveDirty = False
+        if pending is None:
+            if self.debug_enabled:
+                self.append_log("[DEBUG] packInProgress=True => keep pending save events", "INFO")
+        elif pending:
+            if self.debug_enabled:
+                self.append_log(f"[DEBUG] {len(pending)} pending save event(s) => calling pack_on_save", "INFO")
             self.pack_on_save()
-        else:
+        elif self.debug_enabled:
             self.append_log("[DEBUG] docSaveDirty is False => do nothing", "INFO")
 
     ##################################
@@ -277,6 +803,7 @@ class MDZLauncher(QtWidgets.QMainWindow):
             new_config = dialog.get_config()
             self.config.update(new_config)
             save_config(self.config)
+            self._refresh_paths()
             self.append_log("配置已更新", "INFO")
 
     def new_mdz(self):
@@ -286,12 +813,15 @@ class MDZLauncher(QtWidgets.QMainWindow):
             "MDZ Files (*.mdz);;All Files (*)",
             options=options
         )
-        if file_path:
+        # 对话框打开期间会话状态可能已变化
+        if file_path and not self._session_busy():
             if not file_path.lower().endswith(".mdz"):
                 file_path += ".mdz"
             self.mdz_path = file_path
             self.temp_dir = os.path.join(tempfile.gettempdir(), f"mdz_temp_{uuid.uuid4()}")
             os.makedirs(self.temp_dir, exist_ok=True)
+            self._lastDocHash = None
+            self._lastPackedSig = {}
 
             doc_path = os.path.join(self.temp_dir, "document.md")
             with open(doc_path, "w", encoding="utf-8") as f:
@@ -310,38 +840,42 @@ class MDZLauncher(QtWidgets.QMainWindow):
             "MDZ Files (*.mdz);;All Files (*)",
             options=options
         )
-        if file_path:
+        if file_path and not self._session_busy():
             self.mdz_path = file_path
             self.append_log(f"打开 .mdz 文件: {self.mdz_path}", "INFO")
-            self.unpack_mdz()
-            self.launch_typora()
+            if self.unpack_mdz():
+                self.launch_typora()
 
     def unpack_mdz(self):
-        seven_zip = resolve_path(self.config["7zip_path"])
-        if not os.path.exists(seven_zip):
-            self.append_log(f"错误: 7-Zip 未找到: {seven_zip}", "ERROR")
-            QtWidgets.QMessageBox.critical(self, "错误", f"7-Zip 未找到: {seven_zip}")
-            return
-
+        """
+        解压 .mdz 到新的临时目录，成功返回 True。
+        """
         self.temp_dir = os.path.join(tempfile.gettempdir(), f"mdz_temp_{uuid.uuid4()}")
         os.makedirs(self.temp_dir, exist_ok=True)
 
         try:
-            subprocess.run(
-                [seven_zip, "x", "-y", f"-o{self.temp_dir}", self.mdz_path],
-                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
+            # .mdz 本质是 ZIP，直接在进程内解压
+            extract_zip(self.mdz_path, self.temp_dir)
+            # 解压出的 document.md 与 .mdz 中一致，作为后续判断保存是否有变化的基准
+            self._lastDocHash = self._doc_hash()
+            self._lastPackedSig = tree_signature(self.temp_dir)
             self.append_log(f"已解压到临时目录: {self.temp_dir}", "INFO")
-        except subprocess.CalledProcessError as e:
+            return True
+        # RuntimeError: 条目已加密；NotImplementedError: 不支持的压缩方式
+        except (OSError, zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
             logging.error(f"解压失败: {e}")
             self.append_log(f"错误: 解压 .mdz 文件失败: {e}", "ERROR")
             QtWidgets.QMessageBox.critical(self, "错误", f"解压 .mdz 文件失败: {e}")
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            remove_tree(self.temp_dir)
             self.temp_dir = None
+            return False
 
     def launch_typora(self):
-        typora_path = resolve_path(self.config["typora_path"])
-        if not os.path.exists(typora_path):
+        if self.typora_process is not None:
+            self.append_log("Typora 正在编辑另一个文档，请先关闭。", "WARNING")
+            return
+        typora_path = self._typoraExe
+        if not self._typoraFound:
             self.append_log(f"错误: Typora 未找到: {typora_path}", "ERROR")
             QtWidgets.QMessageBox.critical(self, "错误", f"Typora 未找到: {typora_path}")
             return
@@ -354,51 +888,80 @@ class MDZLauncher(QtWidgets.QMainWindow):
 
         self.start_file_monitor()
 
-        try:
-            self.typora_process = subprocess.Popen([typora_path, document_path])
-            self.append_log("Typora 已启动，保存时将自动打包...", "INFO")
-            self.monitor_typora()
-        except Exception as e:
-            logging.error(f"启动 Typora 失败: {e}")
-            self.append_log(f"错误: 无法启动 Typora: {e}", "ERROR")
-            QtWidgets.QMessageBox.critical(self, "错误", f"无法启动 Typora: {e}")
+        # 用 QProcess 启动 Typora，进程退出时由 finished 信号通知，无需轮询
+        self.typora_process = QtCore.QProcess(self)
+        self.typora_process.finished.connect(self._on_typora_finished)
+        self.typora_process.errorOccurred.connect(self._on_typora_error)
+        self.typora_process.readyReadStandardError.connect(self._on_typora_stderr)
+        # stdout 无人读取，丢弃以免管道缓冲区写满后阻塞 Typora；stderr 仍由 _on_typora_stderr 读取
+        self.typora_process.setStandardOutputFile(QtCore.QProcess.nullDevice())
+        self.typora_process.start(typora_path, [document_path])
+        self._update_actions()
+        self.append_log("Typora 已启动，保存时将自动打包...", "INFO")
 
     def start_file_monitor(self):
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
-            self.observer = None
+        self.stop_file_monitor()
 
-        self.event_handler = DocumentSaveHandler(self)
+        self.event_handler = DebouncingEventHandler(DocumentSaveHandler(self))
         self.observer = Observer()
-        self.observer.schedule(self.event_handler, self.temp_dir, recursive=True)
+        # document.md 位于 temp_dir 根目录，无需递归监听 document.assets 中的写入
+        self.observer.schedule(self.event_handler, self.temp_dir, recursive=False)
         self.observer.start()
         self.append_log("文件监控已启动。", "INFO")
 
-    def monitor_typora(self):
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self.check_typora)
-        self.timer.start(1000)
-
-    def check_typora(self):
-        if self.typora_process and self.typora_process.poll() is not None:
-            self.timer.stop()
-
-            # 若 docSaveDirty=True => 先来一次 "保存时打包"
-            if self.docSaveDirty:
-                self.docSaveDirty = False
-                self.resetCount = 0
-                self.lastResetStart = 0.0
-                self.append_log("[DEBUG] docSaveDirty was True at close => pack_on_save", "INFO")
-                self.pack_on_save()
+    def stop_file_monitor(self):
+        if self.observer:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        if self.event_handler:
+            self.event_handler.cancel()
+            self.event_handler = None
+
+    def _on_typora_finished(self, exitCode, exitStatus):
+        # 只处理当前会话的 Typora 进程，已结束的旧进程的信号直接忽略
+        proc = self.sender()
+        if proc is not self.typora_process:
+            return
+        self.typora_process = None
+        proc.deleteLater()
+        if self.debug_enabled:
+            self.append_log(f"[DEBUG] Typora exited: code={exitCode}, status={exitStatus}", "INFO")
+
+        # Typora 已关闭，不会再有保存事件；尚未打包的保存由最终打包一并包含
+        self.stop_file_monitor()
+        self.docSaveTimer.stop()
+        self._maxWaitTimer.stop()
+        with QtCore.QMutexLocker(self._stateMutex):
+            if self.debug_enabled and self.docSaveDirty:
+                self.append_log("[DEBUG] docSaveDirty was True at close => included in final pack", "INFO")
+            self._pendingEvents = set()
+            self.docSaveDirty = False
 
-            # 最终关闭打包
-            self.pack_mdz(final=True)
-            if self.observer:
-                self.observer.stop()
-                self.observer.join()
-                self.observer = None
-            self.append_log("Typora 已关闭，最终打包完成。", "INFO")
+        # 最终关闭打包（后台执行，完成后在 _on_pack_finished 中清理临时目录）
+        self.pack_mdz(final=True)
+        self._update_actions()
+
+    def _on_typora_error(self, error):
+        # 启动失败时不会发出 finished 信号
+        proc = self.sender()
+        if error == QtCore.QProcess.FailedToStart and proc is self.typora_process:
+            msg = proc.errorString()
+            self.typora_process = None
+            proc.deleteLater()
+            self.stop_file_monitor()
+            self._update_actions()
+            logging.error(f"启动 Typora 失败: {msg}")
+            self.append_log(f"错误: 无法启动 Typora: {msg}", "ERROR")
+            QtWidgets.QMessageBox.critical(self, "错误", f"无法启动 Typora: {msg}")
+
+    def _on_typora_stderr(self):
+        proc = self.sender()
+        if proc is not self.typora_process:
+            return
+        data = bytes(proc.readAllStandardError()).decode("utf-8", "replace").strip()
+        if data and self.debug_enabled:
+            self.append_log(f"[DEBUG] Typora stderr: {data}", "INFO")
 
     ##################################
     # 打包相关
@@ -407,74 +970,155 @@ class MDZLauncher(QtWidgets.QMainWindow):
         self.append_log("[PACK] pack_on_save triggered => calling pack_mdz(final=False)", "INFO")
 
         # 若已在打包 => 不再重复进入
-        if self.packInProgress:
-            self.docSaveDirty = True  # 记录还有一次修改
+        with QtCore.QMutexLocker(self._stateMutex):
+            pack_in_progress = self.packInProgress
+            if pack_in_progress:
+                self.docSaveDirty = True  # 记录还有一次修改
+        if pack_in_progress:
             self.append_log("[WARN] pack_on_save called but packInProgress=True => skipping", "WARNING")
             return
 
-        self.pack_mdz(final=False)
-
-    def pack_mdz(self, final=True):
-        self.packInProgress = True
-        try:
-            if not self.temp_dir or not self.mdz_path:
-                self.append_log("错误: 临时目录或 .mdz 文件路径未设置。", "ERROR")
-                return
-
-            seven_zip = resolve_path(self.config["7zip_path"])
-            if not os.path.exists(seven_zip):
-                self.append_log(f"错误: 7-Zip 未找到: {seven_zip}", "ERROR")
-                QtWidgets.QMessageBox.critical(self, "错误", f"7-Zip 未找到: {seven_zip}")
-                return
+        # 内容与上次打包时相同（自动保存、格式化保存等）=> 无需打包
+        doc_hash = self._doc_hash()
+        if doc_hash is not None and doc_hash == self._lastDocHash:
+            self.append_log("[PACK] no-op save, skipping pack", "INFO")
+            return
 
-            temp_mdz = self.mdz_path + ".temp"
-            if os.path.exists(temp_mdz):
-                os.remove(temp_mdz)
+        self.pack_mdz(final=False, doc_hash=doc_hash)
 
-            # 调用 7-zip 打包
-            subprocess.run(
-                [seven_zip, "a", "-tzip", "-mx9", temp_mdz, f"{self.temp_dir}\\*"],
-                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
+    def _doc_hash(self):
+        # document.md 不存在（如正被重命名替换）时返回 None，此时不跳过打包
+        if not self.temp_dir:
+            return None
+        try:
+            return file_hash(os.path.join(self.temp_dir, "document.md"))
+        except OSError:
+            return None
+
+    def pack_mdz(self, final=True, doc_hash=None):
+        """
+        在 QThreadPool 中打包 temp_dir 到 .mdz，完成后在主线程调用 _on_pack_finished。
+        成功提交打包任务返回 True；已有任务在执行时，最终打包会排在其后。
+        """
+        with QtCore.QMutexLocker(self._stateMutex):
+            if self.packInProgress:
+                if final:
+                    self._finalPackPending = True
+                return False
+        if not self.temp_dir or not self.mdz_path:
+            self.append_log("错误: 临时目录或 .mdz 文件路径未设置。", "ERROR")
+            return False
+
+        # .mdz 本质是 ZIP，直接在进程内打包；保存时用压缩级别1，最终关闭时用9
+        job = PackJob(
+            self.temp_dir, self.mdz_path, 9 if final else 1,
+            final, doc_hash, self.append_log, self.debug_enabled,
+            prev_sig=self._lastPackedSig
+        )
+        job.signals.finished.connect(self._on_pack_finished)
+        QtCore.QThreadPool.globalInstance().start(job)
+        # 任务已提交后再标记；pack_mdz 只在主线程调用，finished 要等回到事件循环才会处理
+        self._packJob = job
+        with QtCore.QMutexLocker(self._stateMutex):
+            self.packInProgress = True
+        return True
+
+    def _on_pack_finished(self, success):
+        job = self._packJob
+        self._packJob = None
+        with QtCore.QMutexLocker(self._stateMutex):
+            self.packInProgress = False
+            dirty = self.docSaveDirty
+            final_pending = self._finalPackPending
+            self._finalPackPending = False
 
-            # 多次重试移动 temp_mdz -> self.mdz_path
-            success = safe_move(
-                src=temp_mdz,
-                dst=self.mdz_path,
-                attempts=5,
-                wait=0.5,
-                logger=self.append_log
-            )
+        if job.final:
             if not success:
-                self.append_log("[ERROR] Failed to move .temp => .mdz after multiple attempts", "ERROR")
+                # 打包或替换失败时临时目录是唯一的完整副本，保留以便手动恢复
+                self.append_log(f"错误: 最终打包失败，临时目录已保留: {job.srcDir}", "ERROR")
+                self._update_actions()
                 return
-
-            if final:
-                self.append_log("已重新打包 .mdz 文件（最终关闭）。", "INFO")
-                self.toaster.show_toast("MDZ Launcher", "成功更新 .mdz 文件", duration=5, threaded=True)
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
-                self.temp_dir = None
-            else:
-                self.append_log("已自动打包 .mdz 文件（保存时）。", "INFO")
-
-        except subprocess.CalledProcessError as e:
-            logging.error(f"打包失败: {e}")
-            self.append_log(f"错误: 重新打包 .mdz 文件失败: {e}", "ERROR")
-            if final and self.temp_dir:
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.append_log("已重新打包 .mdz 文件（最终关闭）。", "INFO")
+            self.show_toast("成功更新 .mdz 文件")
+            remove_tree(job.srcDir)
+            if self.temp_dir == job.srcDir:
                 self.temp_dir = None
+                self._lastDocHash = None
+                self._lastPackedSig = {}
+            self.append_log("Typora 已关闭，最终打包完成。", "INFO")
+            self._update_actions()
+            return
 
-        finally:
-            self.packInProgress = False
-            # 若在打包过程中又出现了新的 docSaveDirty, 并且本次不是 final
-            if self.docSaveDirty and not final:
+        if success:
+            self.append_log("已自动打包 .mdz 文件（保存时）。", "INFO")
+            self._lastDocHash = job.docHash
+            self._lastPackedSig = job.signature
+        # Typora 在打包过程中关闭 => 接着执行最终打包
+        if final_pending:
+            self.pack_mdz(final=True)
+        # 若在打包过程中又出现了新的 docSaveDirty
+        elif dirty:
+            if self.debug_enabled:
                 self.append_log("[DEBUG] Another docSaveDirty arrived while packing => reset_doc_save_timer", "INFO")
-                self.reset_doc_save_timer()
+            self.reset_doc_save_timer()
 
     ##################################
     # UI操作
     ##################################
+    def _create_toast_notifier(self):
+        # 延迟导入 winsdk；未安装或 AppUserModelID 注册失败时返回 None
+        try:
+            from winsdk.windows.ui.notifications import ToastNotificationManager
+        except ImportError:
+            return None
+        if not register_aumid(TOAST_AUMID, "MDZ Launcher"):
+            return None
+        return ToastNotificationManager.create_toast_notifier(TOAST_AUMID)
+
+    def show_toast(self, message):
+        """
+        弹出系统通知。notifier 只创建一次；winsdk 不可用或发送失败时改用托盘图标通知。
+        """
+        if not self._toastChecked:
+            self._toastChecked = True
+            try:
+                self._toastNotifier = self._create_toast_notifier()
+            except Exception as e:
+                self.append_log(f"[WARN] 初始化系统通知失败: {e}", "WARNING")
+        if self._toastNotifier is not None:
+            try:
+                from winsdk.windows.ui.notifications import ToastNotification
+                from winsdk.windows.data.xml.dom import XmlDocument
+                xml = XmlDocument()
+                xml.load_xml(
+                    '<toast><visual><binding template="ToastText01">'
+                    f'<text>{escape(message)}</text>'
+                    '</binding></visual></toast>'
+                )
+                self._toastNotifier.show(ToastNotification(xml))
+                return
+            except Exception as e:
+                self.append_log(f"[WARN] 显示通知失败: {e}，改用托盘通知", "WARNING")
+                self._toastNotifier = None
+        if self._trayIcon is None:
+            icon = self.windowIcon()
+            if icon.isNull():
+                icon = self.style().standardIcon(QtWidgets.QStyle.SP_ComputerIcon)
+            self._trayIcon = QtWidgets.QSystemTrayIcon(icon, self)
+            self._trayIcon.show()
+        self._trayIcon.showMessage("MDZ Launcher", message, QtWidgets.QSystemTrayIcon.Information, 5000)
+
+    def closeEvent(self, event):
+        # Typora 作为 QProcess 子进程运行，关闭启动器会连带结束 Typora 并跳过最终打包
+        # 后台打包尚未完成时同样不能退出
+        if self._session_busy():
+            QtWidgets.QMessageBox.information(self, "提示", "请先关闭 Typora，待最终打包完成后再退出。")
+            event.ignore()
+            return
+        super().closeEvent(event)
+
     def clear_log(self):
+        self._logBuf.clear()
         self.log_view.clear()
         self.append_log("日志已清除。", "INFO")
 
@@ -501,14 +1145,6 @@ class SettingsDialog(QtWidgets.QDialog):
     def initUI(self):
         layout = QtWidgets.QVBoxLayout()
 
-        self.zip_label = QtWidgets.QLabel("7-Zip 路径:")
-        self.zip_path = QtWidgets.QLineEdit(self.config.get("7zip_path", ""))
-        self.zip_browse = QtWidgets.QPushButton("浏览")
-        self.zip_browse.clicked.connect(self.browse_7zip)
-        zip_layout = QtWidgets.QHBoxLayout()
-        zip_layout.addWidget(self.zip_path)
-        zip_layout.addWidget(self.zip_browse)
-
         self.typora_label = QtWidgets.QLabel("Typora 路径:")
         self.typora_path = QtWidgets.QLineEdit(self.config.get("typora_path", ""))
         self.typora_browse = QtWidgets.QPushButton("浏览")
@@ -526,30 +1162,12 @@ class SettingsDialog(QtWidgets.QDialog):
         buttons_layout.addWidget(self.save_button)
         buttons_layout.addWidget(self.cancel_button)
 
-        layout.addWidget(self.zip_label)
-        layout.addLayout(zip_layout)
         layout.addWidget(self.typora_label)
         layout.addLayout(typora_layout)
         layout.addStretch()
         layout.addLayout(buttons_layout)
         self.setLayout(layout)
 
-    def browse_7zip(self):
-        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
-            self, "选择 7z.exe", "",
-            "Executable Files (*.exe);;All Files (*)"
-        )
-        if file_path:
-            try:
-                rel_path = os.path.relpath(file_path, app_dir)
-                if not rel_path.startswith(".."):
-                    self.zip_path.setText(rel_path)
-                else:
-                    self.zip_path.setText(file_path)
-            except ValueError as ve:
-                logging.error(f"浏览7-Zip路径时出错: {ve}")
-                self.zip_path.setText(file_path)
-
     def browse_typora(self):
         file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
             self, "选择 Typora.exe", "",
@@ -568,7 +1186,6 @@ class SettingsDialog(QtWidgets.QDialog):
 
     def get_config(self):
         return {
-            "7zip_path": self.zip_path.text(),
             "typora_path": self.typora_path.text()
         }
 
@@ -588,8 +1205,8 @@ def main():
             if os.path.isfile(mdz_file) and mdz_file.lower().endswith(".mdz"):
                 window.mdz_path = mdz_file
                 window.append_log(f"通过命令行打开 .mdz 文件: {window.mdz_path}", "INFO")
-                window.unpack_mdz()
-                window.launch_typora()
+                if window.unpack_mdz():
+                    window.launch_typora()
             else:
                 QtWidgets.QMessageBox.warning(window, "无效文件", "传入的文件不是有效的 .mdz 文件。")
 